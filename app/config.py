@@ -12,11 +12,32 @@ PRODUCTS_COLLECTION = "products"
 # Celery settings
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
+CELERY_TASK_SERIALIZER = os.getenv("CELERY_TASK_SERIALIZER", "json")  # "json" or "msgpack"
+PRODUCT_CHUNK_SIZE = max(1, int(os.getenv("PRODUCT_CHUNK_SIZE", "1")))  # Products per worker task
+
+# Bulk submission settings
+NDJSON_BATCH_SIZE = int(os.getenv("NDJSON_BATCH_SIZE", "500"))  # Records per bulk insert
+NDJSON_MAX_RECORD_BYTES = int(os.getenv("NDJSON_MAX_RECORD_BYTES", str(1024 * 1024)))  # 1 MB per record line
+NDJSON_MAX_RECORDS = int(os.getenv("NDJSON_MAX_RECORDS", "10000"))  # Keeps a request within MongoDB's 16 MB document limit
 
 # Image processing settings
 COMPRESSION_QUALITY = 50  # 50% of original quality
 OUTPUT_IMAGE_DIR = os.getenv("OUTPUT_IMAGE_DIR", "./processed_images")
 OUTPUT_IMAGE_BASE_URL = os.getenv("OUTPUT_IMAGE_BASE_URL", "https://example.com/images/")
+MAX_IMAGE_SIZE_BYTES = int(os.getenv("MAX_IMAGE_SIZE_BYTES", str(20 * 1024 * 1024)))  # 20 MB per input image
+ALLOWED_IMAGE_FORMATS = [
+    fmt.strip().upper()
+    for fmt in os.getenv("ALLOWED_IMAGE_FORMATS", "JPEG,MPO,PNG,GIF,WEBP,BMP,TIFF").split(",")
+    if fmt.strip()
+]
+
+# Local input settings (comma-separated directories that file:// URLs and absolute paths may read from)
+LOCAL_IMAGE_ROOTS = [
+    os.path.realpath(path.strip())
+    for path in os.getenv("LOCAL_IMAGE_ROOTS", "").split(",")
+    if path.strip()
+]
+LOCAL_IMAGE_USE_MMAP = os.getenv("LOCAL_IMAGE_USE_MMAP", "true").lower() == "true"
 
 # Webhook settings
 WEBHOOK_ENABLED = os.getenv("WEBHOOK_ENABLED", "false").lower() == "true"
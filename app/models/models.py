@@ -9,6 +9,7 @@ class ProcessingStatus(str, Enum):
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 class ProductImage(BaseModel):
@@ -41,6 +42,16 @@ class StatusResponse(BaseModel):
     error_message: Optional[str] = None
 
 
+class CancelResponse(BaseModel):
+    request_id: str
+    status: ProcessingStatus
+    completion_percentage: float
+    processed_products: int
+    partial_products: int = 0
+    total_products: int
+    products: List[ProductImage] = []
+
+
 class WebhookPayload(BaseModel):
     request_id: str
     status: ProcessingStatus
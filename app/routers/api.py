@@ -1,13 +1,15 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Query
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Query, Request
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 import logging
 from bson import ObjectId
 import io
 
-from app.models.models import RequestResponse, StatusResponse, ProcessingStatus
+from app.models.models import RequestResponse, StatusResponse, CancelResponse, ProcessingStatus
 from app.services.csv_service import CSVService
+from app.services.ndjson_service import NDJSONService
 from app.services.db_service import db_service
 from app.tasks.worker import process_images
+from app.config import NDJSON_BATCH_SIZE, NDJSON_MAX_RECORDS
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -54,6 +56,145 @@ async def upload_csv(background_tasks: BackgroundTasks, file: UploadFile = File(
         logger.error(f"Error processing upload: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+async def _ingest_ndjson_records(request: Request, request_id: str, collect_results: bool = False):
+    """
+    Read the NDJSON body, validating records one by one and bulk inserting the valid ones.
+    Records are only reported as accepted once their batch has been stored.
+    Stops early if the request is cancelled while it is being uploaded.
+    Returns: (per-record results, summary)
+    """
+    seen_serial_numbers = set()
+    batch = []
+    batch_results = []
+    results = []
+    accepted = 0
+    rejected = 0
+    cancelled = False
+    finished = False
+    
+    def flush_batch() -> bool:
+        nonlocal batch, batch_results, accepted
+        # Stop storing records once the request has been cancelled
+        if db_service.is_request_cancelled(request_id):
+            return False
+        if not db_service.append_products(request_id, batch):
+            raise RuntimeError(f"Failed to store records for request {request_id}")
+        accepted += len(batch)
+        if collect_results:
+            results.extend(batch_results)
+        batch = []
+        batch_results = []
+        return True
+    
+    try:
+        async for line_number, line in NDJSONService.iter_lines(request.stream()):
+            is_valid, error_message, product_data = NDJSONService.validate_record(line, seen_serial_numbers)
+            if not is_valid:
+                rejected += 1
+                if collect_results:
+                    results.append({"line": line_number, "accepted": False, "error": error_message})
+                continue
+            
+            # Products are stored in the request document, which MongoDB caps at 16 MB
+            if accepted + len(batch) >= NDJSON_MAX_RECORDS:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Too many records: at most {NDJSON_MAX_RECORDS} products are accepted per request"
+                )
+            
+            batch.append(product_data)
+            batch_results.append({"line": line_number, "accepted": True, "serial_number": product_data["serial_number"]})
+            if len(batch) >= NDJSON_BATCH_SIZE and not flush_batch():
+                cancelled = True
+                break
+        
+        if batch and not cancelled and not flush_batch():
+            cancelled = True
+        
+        if cancelled:
+            status = ProcessingStatus.CANCELLED
+        elif accepted:
+            # Start processing only once every record has been stored
+            process_images.delay(request_id)
+            status = ProcessingStatus.PENDING
+        else:
+            db_service.update_request_status(
+                request_id,
+                ProcessingStatus.FAILED,
+                error_message="No valid product records submitted"
+            )
+            status = ProcessingStatus.FAILED
+        
+        finished = True
+    finally:
+        # Never leave a partially ingested request pending, including on client disconnect
+        if not finished:
+            db_service.update_request_status(
+                request_id,
+                ProcessingStatus.FAILED,
+                error_message="NDJSON upload was interrupted before all records were stored"
+            )
+    
+    results.sort(key=lambda result: result["line"])
+    summary = {"request_id": request_id, "status": status, "accepted": accepted, "rejected": rejected}
+    return results, summary
+
+@router.post("/api/upload/ndjson", response_model=RequestResponse)
+async def upload_ndjson(request: Request, stream_results: bool = Query(False)):
+    """
+    Upload product records as newline-delimited JSON for processing.
+    Each line holds one product with serial_number, product_name and input_image_urls.
+    Optionally stream a result for every record back as NDJSON once the body has been read.
+    """
+    try:
+        # Create the request up front so records can be inserted in batches as they arrive
+        request_id = db_service.create_request({
+            "status": ProcessingStatus.PENDING,
+            "products": [],
+            "completion_percentage": 0.0
+        })
+    except Exception as e:
+        logger.error(f"Error creating request for NDJSON upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    
+    try:
+        # The body is consumed completely before any response is written
+        results, summary = await _ingest_ndjson_records(request, request_id, collect_results=stream_results)
+    except HTTPException as e:
+        db_service.update_request_status(request_id, ProcessingStatus.FAILED, error_message=e.detail)
+        raise
+    except ValueError as e:
+        db_service.update_request_status(request_id, ProcessingStatus.FAILED, error_message=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        error_msg = f"Error processing NDJSON upload: {str(e)}"
+        logger.error(error_msg)
+        db_service.update_request_status(request_id, ProcessingStatus.FAILED, error_message=error_msg)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    
+    if stream_results:
+        def result_stream():
+            yield NDJSONService.format_line({"request_id": request_id})
+            for result in results:
+                yield NDJSONService.format_line(result)
+            yield NDJSONService.format_line(summary)
+        
+        return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+    
+    if summary["status"] == ProcessingStatus.FAILED:
+        raise HTTPException(status_code=400, detail="No valid product records submitted")
+    
+    if summary["status"] == ProcessingStatus.CANCELLED:
+        return RequestResponse(
+            request_id=request_id,
+            message=f"Request cancelled during upload after {summary['accepted']} records were stored"
+        )
+    
+    return RequestResponse(
+        request_id=request_id,
+        message=f"{summary['accepted']} records accepted for processing, {summary['rejected']} rejected"
+    )
+
 @router.get("/api/status/{request_id}", response_model=StatusResponse)
 async def check_status(request_id: str, include_products: bool = Query(False)):
     """
@@ -90,6 +231,56 @@ async def check_status(request_id: str, include_products: bool = Query(False)):
         logger.error(f"Error checking status: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@router.post("/api/cancel/{request_id}", response_model=CancelResponse)
+async def cancel_request(request_id: str):
+    """
+    Cancel a pending or in-progress processing request.
+    Queued product tasks are skipped and running ones stop after their current image.
+    Returns the results processed so far.
+    """
+    try:
+        # Validate ObjectId format
+        if not ObjectId.is_valid(request_id):
+            raise HTTPException(status_code=400, detail="Invalid request ID format")
+        
+        # Mark the request as cancelled; workers check this flag before each image
+        if not db_service.cancel_request(request_id):
+            request_data = db_service.get_request(request_id)
+            if not request_data:
+                raise HTTPException(status_code=404, detail="Request not found")
+            if request_data["status"] != ProcessingStatus.CANCELLED:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Request cannot be cancelled. Current status: {request_data['status']}"
+                )
+        
+        request_data = db_service.get_request(request_id)
+        if not request_data:
+            raise HTTPException(status_code=404, detail="Request not found")
+        
+        # Report the products that were processed before cancellation, counting
+        # products stopped part way through their images separately
+        products = request_data.get("products", [])
+        with_output = [product for product in products if product.get("output_image_urls")]
+        processed_products = sum(1 for product in products if db_service.is_product_processed(product))
+        partial_products = sum(1 for product in with_output if not db_service.is_product_processed(product))
+        total_products = len(products)
+        
+        return CancelResponse(
+            request_id=request_id,
+            status=ProcessingStatus.CANCELLED,
+            completion_percentage=(processed_products / total_products) * 100 if total_products > 0 else 0,
+            processed_products=processed_products,
+            partial_products=partial_products,
+            total_products=total_products,
+            products=with_output
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error cancelling request: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 @router.get("/api/download/{request_id}")
 async def download_results(request_id: str):
     """
@@ -21,6 +21,21 @@ class DatabaseService:
         result = self.requests_collection.insert_one(request_data)
         return str(result.inserted_id)
     
+    def append_products(self, request_id: str, products: List[Dict[str, Any]]) -> bool:
+        """Bulk append a batch of products to a processing request"""
+        try:
+            result = self.requests_collection.update_one(
+                {"_id": ObjectId(request_id)},
+                {
+                    "$push": {"products": {"$each": products}},
+                    "$set": {"updated_at": datetime.utcnow()}
+                }
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            logger.error(f"Error appending products to request {request_id}: {str(e)}")
+            return False
+    
     def get_request(self, request_id: str) -> Optional[Dict[str, Any]]:
         """Get a processing request by ID"""
         try:
@@ -32,6 +47,39 @@ class DatabaseService:
             logger.error(f"Error retrieving request {request_id}: {str(e)}")
             return None
     
+    def get_product_count(self, request_id: str) -> Optional[int]:
+        """
+        Get the number of products in a request without loading them
+        Returns None if the request does not exist; database errors are raised to the caller
+        """
+        result = list(self.requests_collection.aggregate([
+            {"$match": {"_id": ObjectId(request_id)}},
+            {"$project": {"product_count": {"$size": "$products"}}}
+        ]))
+        return result[0]["product_count"] if result else None
+    
+    def get_product_batch(self, request_id: str, start: int, count: int) -> Optional[Dict[str, Any]]:
+        """Get the request status and a slice of its products in one projected query"""
+        try:
+            return self.requests_collection.find_one(
+                {"_id": ObjectId(request_id)},
+                {"status": 1, "products": {"$slice": [start, count]}}
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving products {start}-{start + count} for request {request_id}: {str(e)}")
+            return None
+    
+    def get_completion_state(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Get the request status and only the output image URLs and processed flags of its products"""
+        try:
+            return self.requests_collection.find_one(
+                {"_id": ObjectId(request_id)},
+                {"status": 1, "products.output_image_urls": 1, "products.processed": 1}
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving completion state for request {request_id}: {str(e)}")
+            return None
+    
     def update_request_status(self, request_id: str, status: ProcessingStatus, 
                               completion_percentage: float = None,
                               error_message: str = None) -> bool:
@@ -48,18 +96,55 @@ class DatabaseService:
             if error_message is not None:
                 update_data["error_message"] = error_message
                 
+            # A cancelled request is final, so late task updates must not revive it
             result = self.requests_collection.update_one(
-                {"_id": ObjectId(request_id)},
+                {"_id": ObjectId(request_id), "status": {"$ne": ProcessingStatus.CANCELLED}},
                 {"$set": update_data}
             )
-            return result.modified_count > 0
+            # Matched rather than modified, so callers can tell a cancelled request from a no-op write
+            return result.matched_count > 0
         except Exception as e:
             logger.error(f"Error updating request {request_id}: {str(e)}")
             return False
     
+    def cancel_request(self, request_id: str) -> bool:
+        """Mark a pending or in-progress request as cancelled"""
+        try:
+            result = self.requests_collection.update_one(
+                {
+                    "_id": ObjectId(request_id),
+                    "status": {"$in": [ProcessingStatus.PENDING, ProcessingStatus.IN_PROGRESS]}
+                },
+                {
+                    "$set": {
+                        "status": ProcessingStatus.CANCELLED,
+                        "updated_at": datetime.utcnow()
+                    }
+                }
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            logger.error(f"Error cancelling request {request_id}: {str(e)}")
+            return False
+    
+    def is_request_cancelled(self, request_id: str) -> bool:
+        """Check whether a request has been cancelled, fetching only its status"""
+        try:
+            request = self.requests_collection.find_one(
+                {"_id": ObjectId(request_id)},
+                {"status": 1}
+            )
+            return bool(request) and request.get("status") == ProcessingStatus.CANCELLED
+        except Exception as e:
+            logger.error(f"Error checking cancellation for request {request_id}: {str(e)}")
+            return False
+    
     def update_product_images(self, request_id: str, serial_number: int, 
-                              output_image_urls: List[str]) -> bool:
-        """Update the output image URLs for a product in a request"""
+                              output_image_urls: List[str], processed: bool = True) -> bool:
+        """
+        Update the output image URLs for a product in a request
+        processed records whether every input image was attempted, as opposed to stopped part way
+        """
         try:
             result = self.requests_collection.update_one(
                 {
@@ -69,6 +154,7 @@ class DatabaseService:
                 {
                     "$set": {
                         "products.$.output_image_urls": output_image_urls,
+                        "products.$.processed": processed,
                         "updated_at": datetime.utcnow()
                     }
                 }
@@ -78,6 +164,14 @@ class DatabaseService:
             logger.error(f"Error updating product images for request {request_id}, product {serial_number}: {str(e)}")
             return False
     
+    @staticmethod
+    def is_product_processed(product: Dict[str, Any]) -> bool:
+        """Check whether all images of a product have been attempted"""
+        if "processed" in product:
+            return bool(product["processed"])
+        # Products written before the flag existed only stored output URLs once finished
+        return bool(product.get("output_image_urls"))
+    
     def save_product(self, product_data: Dict[str, Any]) -> str:
         """Save a product to the database"""
         result = self.products_collection.insert_one(product_data)
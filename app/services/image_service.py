@@ -2,12 +2,17 @@ import os
 import requests
 from PIL import Image
 import io
+import mmap
 import uuid
 import logging
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Union
+from urllib.parse import urlparse, unquote
 import time
 
-from app.config import COMPRESSION_QUALITY, OUTPUT_IMAGE_DIR, OUTPUT_IMAGE_BASE_URL
+from app.config import (
+    COMPRESSION_QUALITY, OUTPUT_IMAGE_DIR, OUTPUT_IMAGE_BASE_URL,
+    MAX_IMAGE_SIZE_BYTES, ALLOWED_IMAGE_FORMATS, LOCAL_IMAGE_ROOTS, LOCAL_IMAGE_USE_MMAP
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,24 +20,77 @@ class ImageService:
     def __init__(self):
         # Create output directory if it doesn't exist
         os.makedirs(OUTPUT_IMAGE_DIR, exist_ok=True)
+        
+        # Only try the decoders for allowed formats. Other plugins may seek past the end of
+        # small inputs, which a memory map rejects. MPO files are identified by the JPEG plugin.
+        Image.init()
+        self.decoder_formats = sorted({
+            "JPEG" if fmt == "MPO" else fmt
+            for fmt in ALLOWED_IMAGE_FORMATS
+            if ("JPEG" if fmt == "MPO" else fmt) in Image.OPEN
+        })
     
     def download_image(self, image_url: str) -> Optional[bytes]:
         """Download an image from a URL"""
         try:
-            response = requests.get(image_url, timeout=30)
-            if response.status_code == 200:
-                return response.content
-            else:
-                logger.error(f"Failed to download image from {image_url}, status code: {response.status_code}")
-                return None
+            with requests.get(image_url, timeout=30, stream=True) as response:
+                if response.status_code != 200:
+                    logger.error(f"Failed to download image from {image_url}, status code: {response.status_code}")
+                    return None
+                
+                content_length = response.headers.get("Content-Length")
+                if content_length and content_length.isdigit() and int(content_length) > MAX_IMAGE_SIZE_BYTES:
+                    logger.error(f"Image {image_url} exceeds the maximum size of {MAX_IMAGE_SIZE_BYTES} bytes")
+                    return None
+                
+                # Enforce the limit while reading in case Content-Length is missing or wrong
+                image_data = bytearray()
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    image_data.extend(chunk)
+                    if len(image_data) > MAX_IMAGE_SIZE_BYTES:
+                        logger.error(f"Image {image_url} exceeds the maximum size of {MAX_IMAGE_SIZE_BYTES} bytes")
+                        return None
+                return bytes(image_data)
         except Exception as e:
             logger.error(f"Error downloading image from {image_url}: {str(e)}")
             return None
     
-    def compress_image(self, image_data: bytes) -> Optional[bytes]:
+    @staticmethod
+    def is_local_input(image_url: str) -> bool:
+        """Check whether an input refers to a file:// URL or a mounted path"""
+        return image_url.startswith("file://") or os.path.isabs(image_url)
+    
+    def resolve_local_path(self, image_url: str) -> Tuple[bool, str, str]:
+        """
+        Resolve a file:// URL or absolute path to a real path inside LOCAL_IMAGE_ROOTS
+        Returns: (success, path, error_message)
+        """
+        if image_url.startswith("file://"):
+            parsed = urlparse(image_url)
+            if parsed.netloc not in ("", "localhost"):
+                return False, "", f"Remote file URLs are not supported: {image_url}"
+            path = unquote(parsed.path)
+        else:
+            path = image_url
+        
+        # Resolve symlinks and '..' before checking the whitelist
+        real_path = os.path.realpath(path)
+        if not any(os.path.commonpath([real_path, root]) == root for root in LOCAL_IMAGE_ROOTS):
+            return False, "", f"Local image path is not in an allowed directory: {image_url}"
+        
+        return True, real_path, ""
+    
+    def compress_image(self, image_data: Union[bytes, mmap.mmap]) -> Optional[bytes]:
         """Compress an image to 50% of its original quality"""
         try:
-            img = Image.open(io.BytesIO(image_data))
+            # A memory map is already file-like, so the decoder reads straight from it
+            source = io.BytesIO(image_data) if isinstance(image_data, bytes) else image_data
+            img = Image.open(source, formats=self.decoder_formats)
+            
+            # Trust the decoder rather than headers or file extensions to identify the type
+            if img.format not in ALLOWED_IMAGE_FORMATS:
+                logger.error(f"Unsupported image format: {img.format}")
+                return None
             
             # Convert to RGB if it's in another mode that doesn't support JPEG
             if img.mode != 'RGB':
@@ -63,12 +121,64 @@ class ImageService:
             logger.error(f"Error saving image: {str(e)}")
             return False, ""
     
+    def _compress_and_save(self, image_data: Union[bytes, mmap.mmap], image_url: str,
+                           product_name: str) -> Tuple[bool, str, str]:
+        """
+        Compress image data and save the result
+        Returns: (success, output_url, error_message)
+        """
+        # Compress the image
+        compressed_data = self.compress_image(image_data)
+        if not compressed_data:
+            return False, "", f"Failed to compress image from {image_url}"
+        
+        # Save the compressed image
+        success, output_url = self.save_image(compressed_data, product_name)
+        if not success:
+            return False, "", f"Failed to save processed image from {image_url}"
+        
+        return True, output_url, ""
+    
+    def process_local_image(self, image_url: str, product_name: str) -> Tuple[bool, str, str]:
+        """
+        Process an image from local or mounted storage through a read-only memory map
+        Returns: (success, output_url, error_message)
+        """
+        success, path, error = self.resolve_local_path(image_url)
+        if not success:
+            return False, "", error
+        
+        try:
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return False, "", f"Image file is empty: {image_url}"
+                if size > MAX_IMAGE_SIZE_BYTES:
+                    return False, "", f"Image {image_url} exceeds the maximum size of {MAX_IMAGE_SIZE_BYTES} bytes"
+                
+                # Truncating a mapped file while it is decoded raises SIGBUS and kills the worker;
+                # LOCAL_IMAGE_USE_MMAP=false reads files into memory instead
+                if not LOCAL_IMAGE_USE_MMAP:
+                    image_data = f.read(MAX_IMAGE_SIZE_BYTES + 1)
+                    if len(image_data) > MAX_IMAGE_SIZE_BYTES:
+                        return False, "", f"Image {image_url} exceeds the maximum size of {MAX_IMAGE_SIZE_BYTES} bytes"
+                    return self._compress_and_save(image_data, image_url, product_name)
+                
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image_data:
+                    return self._compress_and_save(image_data, image_url, product_name)
+        except OSError as e:
+            return False, "", f"Failed to read image from {image_url}: {str(e)}"
+    
     def process_image(self, image_url: str, product_name: str) -> Tuple[bool, str, str]:
         """
         Process an image - download, compress, and save
         Returns: (success, output_url, error_message)
         """
         try:
+            # Local and mounted inputs skip the HTTP round trip entirely
+            if self.is_local_input(image_url):
+                return self.process_local_image(image_url, product_name)
+            
             # Add a small delay to avoid overwhelming external servers
             time.sleep(0.5)
             
@@ -77,17 +187,7 @@ class ImageService:
             if not image_data:
                 return False, "", f"Failed to download image from {image_url}"
             
-            # Compress the image
-            compressed_data = self.compress_image(image_data)
-            if not compressed_data:
-                return False, "", f"Failed to compress image from {image_url}"
-            
-            # Save the compressed image
-            success, output_url = self.save_image(compressed_data, product_name)
-            if not success:
-                return False, "", f"Failed to save processed image from {image_url}"
-            
-            return True, output_url, ""
+            return self._compress_and_save(image_data, image_url, product_name)
         except Exception as e:
             error_msg = f"Error processing image {image_url}: {str(e)}"
             logger.error(error_msg)
@@ -0,0 +1,110 @@
+import json
+from typing import List, Dict, Any, Tuple, AsyncIterator, Set
+import logging
+
+from app.config import NDJSON_MAX_RECORD_BYTES
+
+logger = logging.getLogger(__name__)
+
+class NDJSONService:
+    REQUIRED_FIELDS = ["serial_number", "product_name", "input_image_urls"]
+
+    @staticmethod
+    async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+        """
+        Split a streamed request body into NDJSON lines
+        Yields: (line_number, line) for every non-blank line
+        Raises ValueError if a line exceeds NDJSON_MAX_RECORD_BYTES
+        """
+        buffer = bytearray()
+        line_number = 0
+        async for chunk in chunks:
+            buffer.extend(chunk)
+            start = 0
+            while True:
+                end = buffer.find(b"\n", start)
+                if end == -1:
+                    break
+                line_number += 1
+                if end - start > NDJSON_MAX_RECORD_BYTES:
+                    raise ValueError(f"Record on line {line_number} exceeds {NDJSON_MAX_RECORD_BYTES} bytes")
+                line = bytes(buffer[start:end])
+                if line.strip():
+                    yield line_number, line
+                start = end + 1
+            del buffer[:start]
+            
+            # Stop buffering a line that can no longer fit within the limit
+            if len(buffer) > NDJSON_MAX_RECORD_BYTES:
+                raise ValueError(f"Record on line {line_number + 1} exceeds {NDJSON_MAX_RECORD_BYTES} bytes")
+
+        if buffer.strip():
+            yield line_number + 1, bytes(buffer)
+
+    @staticmethod
+    def validate_record(line: bytes, seen_serial_numbers: Set[int]) -> Tuple[bool, str, Dict[str, Any]]:
+        """
+        Validate a single NDJSON product record and return parsed data if valid
+        Returns: (is_valid, error_message, product_data)
+        """
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            return False, f"Invalid JSON: {str(e)}", {}
+
+        if not isinstance(record, dict):
+            return False, "Record must be a JSON object", {}
+
+        # Check required fields
+        for field in NDJSONService.REQUIRED_FIELDS:
+            if field not in record or record[field] is None:
+                return False, f"Missing required field: {field}", {}
+
+        # Check serial number is numeric and unique within the request
+        serial_number = record["serial_number"]
+        if isinstance(serial_number, bool) or not isinstance(serial_number, (int, float, str)):
+            return False, "Serial numbers must be numeric", {}
+        if isinstance(serial_number, float):
+            if not serial_number.is_integer():
+                return False, "Serial numbers must be whole numbers", {}
+            serial_number = int(serial_number)
+        elif isinstance(serial_number, str):
+            try:
+                serial_number = int(serial_number.strip())
+            except ValueError:
+                return False, "Serial numbers must be whole numbers", {}
+        # MongoDB stores integers as signed 64-bit values
+        if not -2**63 <= serial_number <= 2**63 - 1:
+            return False, "Serial numbers must fit in a signed 64-bit integer", {}
+        if serial_number in seen_serial_numbers:
+            return False, f"Duplicate serial number: {serial_number}", {}
+
+        # Check for empty product names
+        product_name = record["product_name"]
+        if not isinstance(product_name, str) or not product_name.strip():
+            return False, "Product names cannot be empty", {}
+
+        # Accept either a list of URLs or a comma-separated string, like the CSV column
+        input_image_urls = record["input_image_urls"]
+        if isinstance(input_image_urls, str):
+            input_image_urls = input_image_urls.split(",")
+        if not isinstance(input_image_urls, list) or not all(isinstance(url, str) for url in input_image_urls):
+            return False, "Input image URLs must be a list of strings", {}
+
+        image_urls = [url.strip() for url in input_image_urls if url.strip()]
+        if not image_urls:
+            return False, f"No valid image URLs for product: {product_name}", {}
+
+        seen_serial_numbers.add(serial_number)
+        product_data = {
+            "serial_number": serial_number,
+            "product_name": product_name,
+            "input_image_urls": image_urls,
+            "output_image_urls": []
+        }
+        return True, "", product_data
+
+    @staticmethod
+    def format_line(data: Dict[str, Any]) -> bytes:
+        """Serialize a single result record as an NDJSON line"""
+        return (json.dumps(data, default=str) + "\n").encode()
@@ -1,55 +1,61 @@
 import logging
 import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from celery import shared_task
 
 from app.services.image_service import image_service
 from app.services.db_service import db_service
 from app.models.models import ProcessingStatus, WebhookPayload
-from app.config import WEBHOOK_ENABLED, WEBHOOK_URL
+from app.config import WEBHOOK_ENABLED, WEBHOOK_URL, PRODUCT_CHUNK_SIZE
 
 logger = logging.getLogger(__name__)
 
+def _stop_dispatching(request_id: str, dispatched: int, total_products: int) -> str:
+    """Stop dispatching after a status update was refused, which normally means the request was cancelled"""
+    if not db_service.is_request_cancelled(request_id):
+        raise RuntimeError(f"Failed to update status after dispatching {dispatched} of {total_products} products")
+    
+    logger.info(f"Request {request_id} cancelled after dispatching {dispatched} of {total_products} products")
+    return f"Request {request_id} cancelled after dispatching {dispatched} of {total_products} products"
+
 @shared_task
 def process_images(request_id: str):
     """
     Process all images for a request.
     This task coordinates the overall processing and updates status.
+    Product tasks only carry the request id and a product range; workers load their own batch.
     """
     try:
-        # Retrieve the request from the database
-        request_data = db_service.get_request(request_id)
-        if not request_data:
+        # Only the product count is needed to plan the chunks; database errors are
+        # raised here and reported below rather than treated as a missing request
+        total_products = db_service.get_product_count(request_id)
+        if total_products is None:
             logger.error(f"Request {request_id} not found")
             return
         
-        # Update status to in progress
-        db_service.update_request_status(
+        # Update status to in progress; status updates skip cancelled requests,
+        # so a failed update means the request has been cancelled or the write failed
+        if not db_service.update_request_status(
             request_id, 
             ProcessingStatus.IN_PROGRESS,
             completion_percentage=0
-        )
+        ):
+            return _stop_dispatching(request_id, 0, total_products)
         
-        products = request_data.get("products", [])
-        total_products = len(products)
-        
-        # Process each product
-        for i, product in enumerate(products):
-            # Spawn a task for each product
-            process_product_images.delay(
-                request_id,
-                product["serial_number"],
-                product["product_name"],
-                product["input_image_urls"]
-            )
+        # Process each chunk of products
+        for start in range(0, total_products, PRODUCT_CHUNK_SIZE):
+            # Spawn a task for each chunk
+            count = min(PRODUCT_CHUNK_SIZE, total_products - start)
+            process_product_chunk.delay(request_id, start, count)
             
             # Update completion percentage
-            completion_percentage = ((i + 1) / total_products) * 100
-            db_service.update_request_status(
+            completion_percentage = ((start + count) / total_products) * 100
+            if not db_service.update_request_status(
                 request_id,
                 ProcessingStatus.IN_PROGRESS,
                 completion_percentage=completion_percentage
-            )
+            ):
+                return _stop_dispatching(request_id, start + count, total_products)
         
         return f"Processing started for request {request_id} with {total_products} products"
     except Exception as e:
@@ -62,28 +68,95 @@ def process_images(request_id: str):
         )
         return error_msg
 
+def _process_product(request_id: str, product: Dict[str, Any], check_cancelled: bool) -> Tuple[int, bool]:
+    """
+    Process all images for a single product and store the output URLs
+    Returns: (processed_images, cancelled)
+    """
+    output_image_urls = []
+    cancelled = False
+    
+    for i, image_url in enumerate(product["input_image_urls"]):
+        # Stop early between images if the request was cancelled meanwhile
+        if (check_cancelled or i > 0) and db_service.is_request_cancelled(request_id):
+            cancelled = True
+            break
+        
+        success, output_url, error = image_service.process_image(image_url, product["product_name"])
+        if success:
+            output_image_urls.append(output_url)
+        else:
+            logger.error(f"Error processing image {image_url}: {error}")
+    
+    # Record the outcome, keeping partial results on cancellation; a finished product is
+    # marked processed even if some of its images failed
+    if output_image_urls or not cancelled:
+        db_service.update_product_images(
+            request_id,
+            product["serial_number"],
+            output_image_urls,
+            processed=not cancelled
+        )
+    
+    return len(output_image_urls), cancelled
+
+@shared_task
+def process_product_chunk(request_id: str, start: int, count: int):
+    """Process all images for a chunk of products, identified by their position in the request"""
+    try:
+        # Fetch the status and this chunk's products in a single query
+        batch = db_service.get_product_batch(request_id, start, count)
+        if not batch:
+            return f"Request {request_id} not found"
+        
+        # Drop tasks for cancelled requests as soon as they are dequeued
+        if batch.get("status") == ProcessingStatus.CANCELLED:
+            return f"Skipped products {start}-{start + count}: request {request_id} was cancelled"
+        
+        processed_images = 0
+        
+        for i, product in enumerate(batch.get("products", [])):
+            images, cancelled = _process_product(request_id, product, check_cancelled=i > 0)
+            processed_images += images
+            
+            if cancelled:
+                return f"Stopped products {start}-{start + count} after {processed_images} images: request {request_id} was cancelled"
+            
+        # Check if all products are processed
+        check_request_completion.delay(request_id)
+        
+        return f"Processed {processed_images} images for products {start}-{start + count}"
+    except Exception as e:
+        error_msg = f"Error processing images for products {start}-{start + count}: {str(e)}"
+        logger.error(error_msg)
+        return error_msg
+
 @shared_task
 def process_product_images(request_id: str, serial_number: int, 
                           product_name: str, input_image_urls: List[str]):
-    """Process all images for a single product"""
+    """
+    Process all images for a single product.
+    Kept for messages queued before products were dispatched as chunks; new work uses process_product_chunk.
+    """
     try:
-        output_image_urls = []
-        
-        for image_url in input_image_urls:
-            success, output_url, error = image_service.process_image(image_url, product_name)
-            if success:
-                output_image_urls.append(output_url)
-            else:
-                logger.error(f"Error processing image {image_url}: {error}")
-        
-        # Update the product with processed image URLs
-        if output_image_urls:
-            db_service.update_product_images(request_id, serial_number, output_image_urls)
-            
+        # Drop tasks for cancelled requests as soon as they are dequeued
+        if db_service.is_request_cancelled(request_id):
+            return f"Skipped product {product_name}: request {request_id} was cancelled"
+        
+        product = {
+            "serial_number": serial_number,
+            "product_name": product_name,
+            "input_image_urls": input_image_urls
+        }
+        processed_images, cancelled = _process_product(request_id, product, check_cancelled=False)
+        
+        if cancelled:
+            return f"Stopped product {product_name} after {processed_images} images: request {request_id} was cancelled"
+        
         # Check if all products are processed
         check_request_completion.delay(request_id)
         
-        return f"Processed {len(output_image_urls)} images for product {product_name}"
+        return f"Processed {processed_images} images for product {product_name}"
     except Exception as e:
         error_msg = f"Error processing images for product {product_name}: {str(e)}"
         logger.error(error_msg)
@@ -93,18 +166,14 @@ def process_product_images(request_id: str, serial_number: int,
 def check_request_completion(request_id: str):
     """Check if all products in a request have been processed"""
     try:
-        request_data = db_service.get_request(request_id)
-        if not request_data or request_data.get("status") == ProcessingStatus.COMPLETED:
+        request_data = db_service.get_completion_state(request_id)
+        if not request_data or request_data.get("status") in (ProcessingStatus.COMPLETED, ProcessingStatus.CANCELLED):
             return
         
-        # Check if all products have output image URLs
+        # Check if all products have been processed
         products = request_data.get("products", [])
         total_products = len(products)
-        processed_products = 0
-        
-        for product in products:
-            if product.get("output_image_urls") and len(product.get("output_image_urls")) > 0:
-                processed_products += 1
+        processed_products = sum(1 for product in products if db_service.is_product_processed(product))
         
         # Calculate completion percentage
         completion_percentage = (processed_products / total_products) * 100 if total_products > 0 else 0
@@ -1,5 +1,5 @@
 from celery import Celery
-from app.config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND
+from app.config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND, CELERY_TASK_SERIALIZER
 
 # Create Celery app
 celery_app = Celery(
@@ -11,9 +11,9 @@ celery_app = Celery(
 
 # Configure Celery
 celery_app.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
+    task_serializer=CELERY_TASK_SERIALIZER,
+    accept_content=['json', 'msgpack'],  # Accept both so workers can be switched over gradually
+    result_serializer=CELERY_TASK_SERIALIZER,
     timezone='UTC',
     enable_utc=True,
     task_track_started=True,
@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+# Keep the module-level ImageService from creating ./processed_images in the checkout
+os.environ.setdefault("OUTPUT_IMAGE_DIR", tempfile.mkdtemp())
+
+import pytest
+from PIL import Image
+
+from app.services import image_service as image_service_module
+from app.services.image_service import ImageService
+
+
+@pytest.fixture
+def local_root(tmp_path, monkeypatch):
+    root = os.path.realpath(tmp_path)
+    monkeypatch.setattr(image_service_module, "LOCAL_IMAGE_ROOTS", [root])
+    monkeypatch.setattr(image_service_module, "OUTPUT_IMAGE_DIR", root)
+    return root
+
+
+@pytest.mark.parametrize("image_format", ["WEBP", "TIFF"])
+def test_small_local_image_decodes_through_mmap(local_root, image_format):
+    # Small files used to fail identification because other plugins seek past the end of the map
+    path = os.path.join(local_root, f"small.{image_format.lower()}")
+    Image.new("RGB", (4, 4), "red").save(path, format=image_format)
+    assert os.path.getsize(path) < 2048
+
+    success, output_url, error = ImageService().process_local_image(f"file://{path}", "small")
+
+    assert success, error
+    assert output_url
+
+
+def test_local_image_outside_roots_is_rejected(local_root):
+    success, _, error = ImageService().process_local_image("/etc/passwd", "outside")
+
+    assert not success
+    assert "not in an allowed directory" in error
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from app.services.ndjson_service import NDJSONService
+
+
+def _record(serial_number):
+    return json.dumps({
+        "serial_number": serial_number,
+        "product_name": "SKU1",
+        "input_image_urls": ["https://example.com/1.jpg"]
+    }).encode()
+
+
+@pytest.mark.parametrize("serial_number", [1.9, "1.5", 1e30, "99999999999999999999999", -2**63 - 1])
+def test_invalid_serial_numbers_are_rejected_per_record(serial_number):
+    is_valid, error_message, _ = NDJSONService.validate_record(_record(serial_number), set())
+
+    assert not is_valid
+    assert "Serial numbers" in error_message
+
+
+@pytest.mark.parametrize("serial_number, expected", [(3.0, 3), ("2", 2), (2**63 - 1, 2**63 - 1)])
+def test_whole_serial_numbers_are_accepted(serial_number, expected):
+    is_valid, _, product_data = NDJSONService.validate_record(_record(serial_number), set())
+
+    assert is_valid
+    assert product_data["serial_number"] == expected